@@ -0,0 +1,449 @@
+"""Бенчмарк конвейера сбор данных -> обработка -> отображение.
+
+Запуск:
+    python benchmark.py                       # 10/100/1000 сенсоров, сравнение с baseline (без него — ошибка)
+    python benchmark.py --save-baseline       # сохранить текущие результаты как baseline
+    python benchmark.py --sensors 10,100 --rate 50 --threshold 0.15
+    xvfb-run python benchmark.py --tk         # графики Tk на виртуальном дисплее
+"""
+import argparse
+import copy
+import csv
+import json
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from communication import parse_message
+from devices import Sensor
+from signal_processing import KalmanFilter
+from lab_pneumo_logic import LabPneumoLogic
+from replay import ReplaySession
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_SENSOR_COUNTS = [10, 100, 1000]
+DEFAULT_RATE = 100  # Гц, частота отправки значений одним сенсором
+DEFAULT_THRESHOLD = 0.2  # допустимое ухудшение относительно baseline
+MEMORY_THRESHOLD = 0.5
+LOGIC_TICK = 0.1  # с, период process_serial_data / update_sensor_values_from_queue
+REPLAY_MESSAGES = 2000  # длина записи для replay_asap, не зависит от числа сенсоров
+
+# Этапы Sensor.process_signal, каждый включается отдельно
+PROCESSING_STAGES = {
+    'offset': {'offset': 12345},
+    'calibration_table': {
+        'calibration_table': {'enabled': True, 'points': [[0, 0], [100, 10], [200, 20], [300, 30]]}
+    },
+    'calibration_factor': {'calibration_factor': 1.005},
+    'outlier_detection': {'outlier_detection': {'enabled': True, 'threshold': 10}},
+    'temperature_compensation': {'temperature_compensation': {'enabled': True, 'compensation_factor': 0.001}},
+    'moving_average': {'filters': {'moving_average': 5}},
+    'kalman': {'filters': {'kalman': {'process_noise': 0.01, 'measurement_noise': 0.1}}},
+    'custom_processing': {
+        'custom_processing': {
+            'module': 'custom_processing_module',
+            'function': 'custom_function',
+            'params': {'factor': 2.0, 'offset': 5.0}
+        }
+    },
+}
+
+
+def all_stages_processing():
+    processing = {}
+    for stage in PROCESSING_STAGES.values():
+        for key, value in copy.deepcopy(stage).items():
+            if isinstance(value, dict) and key in processing:
+                processing[key].update(value)
+            else:
+                processing[key] = value
+    return processing
+
+
+def make_config(sensor_count, processing=None, sensors_per_port=32):
+    """Синтетическая конфигурация в формате config.json"""
+    sensors = []
+    for i in range(sensor_count):
+        sensors.append({
+            'id': i + 1,
+            'port': f"COM{i // sensors_per_port + 1}",
+            'name': f"S_{i + 1}",
+            'units': 'psi',
+            'coord_x': 50 + (i % 25) * 48,
+            'coord_y': 40 + (i // 25) % 15 * 48,
+            'processing': copy.deepcopy(processing or {})
+        })
+    valves = [
+        {'id': 1, 'name': 'V_1', 'pin': 22, 'port': 'COM1', 'coord_x': 200, 'coord_y': 100},
+        {'id': 2, 'name': 'V_2', 'pin': 23, 'port': 'COM1', 'coord_x': 200, 'coord_y': 550},
+    ]
+    lines = [
+        {'start_x': 50, 'start_y': 50 + i * 30, 'end_x': 1200, 'end_y': 50 + i * 30, 'width': 2}
+        for i in range(20)
+    ]
+    return {'sensors': sensors, 'valves': valves, 'lines': lines}
+
+
+def make_messages(sensor_count, count):
+    return [
+        json.dumps({'sensor_id': i % sensor_count + 1, 'value': 12345 + (i * 7) % 300})
+        for i in range(count)
+    ]
+
+
+class HeadlessRoot:
+    def after(self, ms, func, *args):
+        pass
+
+
+class HeadlessDrawing:
+    """Отрисовка-заглушка: измеряется только логика очередей"""
+    def __init__(self):
+        self.root = HeadlessRoot()
+
+    def initialize_ui(self, sensors, valves, lines, toggle_valve_callback):
+        pass
+
+    def update_sensor(self, sensor):
+        pass
+
+    def update_graph(self, sensors):
+        pass
+
+    def toggle_valve(self, valve):
+        pass
+
+    def update_connection_state(self, device, state):
+        pass
+
+
+def make_logic(config, drawing, connect=None):
+    """LabPneumoLogic без открытия портов и чтения config.json"""
+    logic = LabPneumoLogic(drawing, connect=connect, start=False)
+    logic.first_value_received = True
+    logic.load_devices(config)
+    return logic
+
+
+def measure(name, func, iterations, samples_per_call=1):
+    """Пропускная способность, задержка на отсчёт и пик памяти для func()"""
+    func()  # прогрев
+
+    latencies = []
+    total_start = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        latencies.append((time.perf_counter_ns() - start) / samples_per_call / 1000.0)
+    total = time.perf_counter() - total_start
+
+    # Память меряем отдельным проходом: tracemalloc искажает время
+    tracemalloc.start()
+    for _ in range(max(1, iterations // 10)):
+        func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'name': name,
+        'throughput': iterations * samples_per_call / total if total else float('inf'),
+        'latency_p50_us': statistics.median(latencies),
+        'latency_p99_us': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'peak_memory_kb': peak / 1024.0,
+    }
+
+
+def bench_parse_message(iterations):
+    messages = make_messages(100, iterations)
+    it = iter(messages * 2)
+    return [measure('parse_message', lambda: parse_message(next(it)), iterations)]
+
+
+def bench_process_signal(iterations):
+    cases = [('none', {})] + list(PROCESSING_STAGES.items()) + [('all', all_stages_processing())]
+    results = []
+    for stage, processing in cases:
+        sensor = Sensor.from_json(make_config(1, processing)['sensors'][0])
+        values = [12345 + (i * 7) % 300 for i in range(64)]
+        counter = [0]
+
+        def step(sensor=sensor, values=values, counter=counter):
+            counter[0] += 1
+            sensor.process_signal(values[counter[0] & 63])
+
+        results.append(measure(f"process_signal[{stage}]", step, iterations))
+    return results
+
+
+def bench_kalman(iterations):
+    kalman = KalmanFilter(0.01, 0.1)
+    return [measure('KalmanFilter.apply', lambda: kalman.apply(12345.0), iterations)]
+
+
+def bench_csv_logging(sensor_count, iterations):
+    logic = make_logic(make_config(sensor_count), HeadlessDrawing())
+    for sensor in logic.sensors.values():
+        sensor.value = 12345.678
+    logic.initialize_csv_logging()
+    try:
+        return [measure(f"csv_logging/n={sensor_count}", logic.write_sensor_data_to_csv, iterations)]
+    finally:
+        logic.csv_file.close()
+        logic.raw_file.close()
+
+
+def bench_queue_handoff(sensor_count, rate, ticks):
+    """Один такт: чтение serial_queue -> sensor_data_queue -> process_signal -> CSV"""
+    logic = make_logic(make_config(sensor_count, all_stages_processing()), HeadlessDrawing())
+    logic.initialize_csv_logging()
+    batch = max(1, int(sensor_count * rate * LOGIC_TICK))
+    now = time.time()
+    messages = [('COM1', message, now) for message in make_messages(sensor_count, batch)]
+
+    def tick():
+        for item in messages:
+            logic.serial_queue.put(item)
+        logic.process_serial_data()
+        logic.update_sensor_values_from_queue()
+
+    try:
+        return [measure(f"queue_handoff/n={sensor_count}", tick, ticks, samples_per_call=batch)]
+    finally:
+        logic.csv_file.close()
+        logic.raw_file.close()
+
+
+class TimedQueue(queue.Queue):
+    """Очередь, запоминающая моменты извлечения: промежуток до следующего get — время обработки элемента"""
+
+    def __init__(self):
+        super().__init__()
+        self.taken = []
+
+    def get_nowait(self):
+        item = super().get_nowait()
+        self.taken.append(time.perf_counter_ns())
+        return item
+
+    def durations(self, end):
+        """Время обработки элементов, извлечённых с прошлого вызова; end — конец такта"""
+        taken, self.taken = self.taken + [end], []
+        return [later - earlier for earlier, later in zip(taken, taken[1:])]
+
+
+def run_replay(config, file_path, trace_memory):
+    session = ReplaySession(file_path, speed=None)
+    logic = make_logic(config, HeadlessDrawing(), connect=session.connect)
+    logic.serial_queue = TimedQueue()
+    logic.sensor_data_queue = TimedQueue()
+    logic.start_time = session.start_time
+    logic.initialize_csv_logging()
+
+    if trace_memory:
+        tracemalloc.start()
+    wall_start = time.perf_counter()
+    logic.start_port_connections()
+    session.start(logic.port_states, logic.serial_queue, logic.stop_event)
+    latencies = []
+    while not session.finished or not logic.serial_queue.empty():
+        logic.process_serial_data()
+        received = logic.serial_queue.durations(time.perf_counter_ns())
+        logic.update_sensor_values_from_queue()
+        processed = logic.sensor_data_queue.durations(time.perf_counter_ns())
+        # Питающий поток дописывает serial_queue во время такта, поэтому задержка
+        # считается для каждого сообщения: разбор и запись raw + обработка сенсора
+        latencies += [(first + second) / 1000.0 for first, second in zip(received, processed)]
+        if not received:
+            time.sleep(0.001)
+    total = time.perf_counter() - wall_start
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    logic.stop_event.set()
+    logic.csv_file.close()
+    logic.raw_file.close()
+    return total, latencies, peak
+
+
+def bench_replay(sensor_count, rate, count):
+    """Воспроизведение записи из count сообщений в режиме «как можно быстрее» через весь конвейер"""
+    config = make_config(sensor_count, all_stages_processing())
+    start = time.time()
+    with open('raw_replay.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Timestamp', 'Port', 'Message'])
+        for i, message in enumerate(make_messages(sensor_count, count)):
+            sensor = config['sensors'][i % sensor_count]
+            writer.writerow([f"{start + i / (sensor_count * rate):.6f}", sensor['port'], message])
+
+    # Время и память меряются разными прогонами: tracemalloc искажает время
+    total, latencies, _ = run_replay(config, 'raw_replay.csv', trace_memory=False)
+    _, _, peak = run_replay(config, 'raw_replay.csv', trace_memory=True)
+
+    latencies.sort()
+    return [{
+        'name': f"replay_asap/n={sensor_count}",
+        'throughput': count / total,
+        'latency_p50_us': statistics.median(latencies) if latencies else 0.0,
+        'latency_p99_us': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0,
+        'peak_memory_kb': peak / 1024.0,
+    }]
+
+
+def bench_tk(sensor_count, iterations, graph_count=4):
+    """Обновление канвы и графиков TkinterDrawing; нужен дисплей (например, xvfb-run)"""
+    import tkinter as tk
+    try:
+        from lab_pneumo_drawing import TkinterDrawing
+        drawing = TkinterDrawing("1280x768", "benchmark")
+    except tk.TclError as e:
+        print(f"Skipping Tk benchmarks: {e}")
+        return []
+
+    try:
+        logic = make_logic(make_config(sensor_count), drawing)
+        drawing.initialize_ui(logic.sensors, logic.valves, logic.lines, lambda valve: None)
+        sensors = list(logic.sensors.values())
+        for sensor in sensors:
+            sensor.value = 12345.678
+        for sensor in sensors[:graph_count]:
+            drawing.show_graph_window(sensor)
+        drawing.root.update()
+
+        def update_sensors():
+            for sensor in sensors:
+                sensor.value += 0.001
+                drawing.update_sensor(sensor)
+            drawing.root.update_idletasks()
+
+        def graph_frame():
+            for sensor in sensors[:graph_count]:
+                sensor.value += 0.001
+            drawing.last_update_time = 0  # снимаем ограничение частоты update_graph
+            drawing.update_graph(logic.sensors)
+            for sensor_id in list(drawing.graph_windows):
+                drawing.animate_graph(sensor_id)
+            drawing.root.update_idletasks()
+
+        def rebuild_static_layer():
+            drawing.static_signature = None
+            drawing.render_static_layer()
+
+        return [
+            measure(f"tk_static_layer/n={sensor_count}", rebuild_static_layer, max(1, iterations // 10)),
+            measure(f"tk_update_sensor/n={sensor_count}", update_sensors, iterations,
+                    samples_per_call=len(sensors)),
+            measure(f"tk_graph_frame/n={sensor_count}", graph_frame, max(1, iterations // 10)),
+        ]
+    finally:
+        drawing.root.destroy()
+
+
+def run_benchmarks(sensor_counts, rate, iterations, tk_enabled):
+    results = []
+    results += bench_parse_message(iterations)
+    results += bench_process_signal(iterations)
+    results += bench_kalman(iterations)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # initialize_csv_logging пишет файл в текущий каталог
+        os.chdir(workdir)
+        try:
+            for sensor_count in sensor_counts:
+                results += bench_csv_logging(sensor_count, max(10, iterations // sensor_count))
+                results += bench_queue_handoff(sensor_count, rate, max(5, iterations // (sensor_count * 10)))
+                results += bench_replay(sensor_count, rate, REPLAY_MESSAGES)
+        finally:
+            os.chdir(cwd)
+
+    if tk_enabled:
+        for sensor_count in sensor_counts:
+            results += bench_tk(sensor_count, max(5, iterations // (sensor_count * 10)))
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Возвращает регрессии относительно baseline и случаи, для которых baseline нет"""
+    regressions = []
+    missing = []
+    for result in results:
+        base = baseline.get(result['name'])
+        if not base:
+            missing.append(result['name'])
+            continue
+        if result['throughput'] < base['throughput'] * (1 - threshold):
+            regressions.append(f"{result['name']}: throughput {result['throughput']:.0f}/s "
+                               f"< baseline {base['throughput']:.0f}/s")
+        if result['latency_p50_us'] > base['latency_p50_us'] * (1 + threshold):
+            regressions.append(f"{result['name']}: p50 latency {result['latency_p50_us']:.2f} us "
+                               f"> baseline {base['latency_p50_us']:.2f} us")
+        if result['peak_memory_kb'] > base['peak_memory_kb'] * (1 + MEMORY_THRESHOLD) + 64:
+            regressions.append(f"{result['name']}: peak memory {result['peak_memory_kb']:.0f} KB "
+                               f"> baseline {base['peak_memory_kb']:.0f} KB")
+    return regressions, missing
+
+
+def print_results(results, baseline):
+    print(f"{'case':<40} {'samples/s':>12} {'p50 us':>10} {'p99 us':>10} {'peak KB':>10} {'vs base':>8}")
+    for result in results:
+        base = baseline.get(result['name'])
+        delta = f"{result['throughput'] / base['throughput'] - 1:+.0%}" if base else '-'
+        print(f"{result['name']:<40} {result['throughput']:>12.0f} {result['latency_p50_us']:>10.2f} "
+              f"{result['latency_p99_us']:>10.2f} {result['peak_memory_kb']:>10.1f} {delta:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acquisition-to-display pipeline benchmark")
+    parser.add_argument('--sensors', default=','.join(map(str, DEFAULT_SENSOR_COUNTS)),
+                        help="comma-separated sensor counts")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="samples per second per sensor")
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--tk', action='store_true', help="also benchmark TkinterDrawing (needs a display)")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed relative slowdown before a case counts as a regression")
+    parser.add_argument('--output', help="write results as JSON")
+    args = parser.parse_args()
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"Error: baseline {args.baseline} not found; run with --save-baseline first")
+        return 2
+
+    sensor_counts = [int(count) for count in args.sensors.split(',') if count]
+    results = run_benchmarks(sensor_counts, args.rate, args.iterations, args.tk)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    if args.save_baseline:
+        baseline.update({result['name']: result for result in results})
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=4, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions, missing = compare_with_baseline(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    for name in missing:
+        print(f"MISSING BASELINE {name}: rerun with --save-baseline to record it")
+    return 1 if regressions or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
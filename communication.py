@@ -1,5 +1,6 @@
 import json
 import serial
+from serial.tools import list_ports
 
 def connect_to_serial_port(port, baudrate=115200):
     try:
@@ -21,10 +22,38 @@ def receive_message(connection, timeout=1):
     except serial.SerialTimeoutException:
         print(f"Error serial port timeout")
         return None
+    except serial.SerialException:
+        raise  # порт потерян, переподключением занимается вызывающий код
     except Exception as e:
         print(f"Error in receive_message: {str(e)}")
         return None
 
+def describe_serial_port(port):
+    """Серийный номер и VID:PID USB-адаптера порта, если они известны"""
+    for info in list_ports.comports():
+        if info.device == port and info.vid is not None:
+            return {'serial_number': info.serial_number, 'vid': info.vid, 'pid': info.pid}
+    return None
+
+def find_serial_port(device, preferred_port=None, excluded_ports=()):
+    """Текущее имя порта устройства (после переподключения USB оно может измениться).
+
+    Порты из excluded_ports (уже открытые или принадлежащие другим портам конфигурации)
+    не рассматриваются. Адаптер без серийного номера нельзя отличить от такого же,
+    поэтому для него подходит только preferred_port. Если устройство не найдено, None.
+    """
+    matching = [info for info in list_ports.comports()
+                if info.vid == device['vid'] and info.pid == device['pid']
+                and info.device not in excluded_ports]
+    if not device['serial_number']:
+        return preferred_port if preferred_port in [info.device for info in matching] else None
+    candidates = [info.device for info in matching if info.serial_number == device['serial_number']]
+    if preferred_port in candidates:
+        return preferred_port
+    if len(candidates) == 1:
+        return candidates[0]
+    return None
+
 def parse_message(str_msg):
     try:
         result = json.loads(str_msg)
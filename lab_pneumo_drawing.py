@@ -1,16 +1,31 @@
 import tkinter as tk
 import math
-import matplotlib.pyplot as plt
 import time
 import numpy as np
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from abc import ABC, abstractmethod
 
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageTk
+except ImportError:  # без Pillow статический слой рисуется элементами канвы
+    Image = None
+
+# matplotlib импортируется при первом открытии графика (load_matplotlib)
+Figure = None
+FigureCanvasTkAgg = None
+
 GRAPH_TIME_WINDOW = 30  # seconds
 GRAPH_UPDATE_INTERVAL = 200  # ms
 MAX_POINTS = 100  # максимальное количество точек на графике
 GRAPH_ANIMATION_INTERVAL = 50  # ms, интервал для анимации
+CONNECTION_COLORS = {'connecting': 'orange', 'connected': 'green', 'offline': 'red'}
+
+def load_matplotlib():
+    global Figure, FigureCanvasTkAgg
+    if Figure is None:
+        import matplotlib.style
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        matplotlib.style.use('fast')  # Используем быстрый стиль для matplotlib
 
 class DrawingStrategy(ABC):
     @abstractmethod
@@ -25,6 +40,10 @@ class DrawingStrategy(ABC):
     def toggle_valve(self, valve):
         pass
 
+    @abstractmethod
+    def update_connection_state(self, device, state):
+        pass
+
     @abstractmethod
     def run(self):
         pass
@@ -40,30 +59,101 @@ class TkinterDrawing(DrawingStrategy):
         self.graph_shown = False
         self.current_sensor = None  # Add this line to track current sensor
         self.graph_windows = {}  # Словарь для хранения всех открытых окон графиков
-        self.start_time = time.time()  # Добавляем начальное время
+        self.clock = time.time  # LabPneumoLogic подменяет часами воспроизведения
+        self.start_time = self.clock()  # Добавляем начальное время
         self.last_update_time = 0
         self.update_counter = 0
-        plt.style.use('fast')  # Используем быстрый стиль для matplotlib
         self.animation_running = {}  # Добавляем флаг для отслеживания анимации
 
+        self.static_items = []  # примитивы статической схемы: (вид, координаты, параметры)
+        self.static_signature = None
+        self.static_image = None  # ссылка на PhotoImage, иначе Tk удалит картинку
+
     def initialize_ui(self, sensors, valves, lines, toggle_valve_callback):
+        # Сетка, линии, баки и камера не меняются: они собираются в один слой,
+        # а отдельными элементами канвы остаются только сенсоры и клапаны
+        self.static_items = []
         self.draw_grid(self.canvas_width, self.canvas_height)
-        self.initialize_sensors(sensors)
-        self.initialize_valves(valves, toggle_valve_callback)
         self.initialize_lines(lines)
         self.draw_tanks()
         self.draw_combustion_chamber()
+        self.render_static_layer()
+        self.initialize_sensors(sensors)
+        self.initialize_valves(valves, toggle_valve_callback)
+
+    def add_static(self, kind, coords, **options):
+        self.static_items.append((kind, tuple(coords), options))
+
+    def render_static_layer(self):
+        """Рисует статическую схему одной картинкой; пересборка только при изменении схемы или размеров"""
+        signature = hash((self.canvas_width, self.canvas_height, repr(self.static_items)))
+        if signature == self.static_signature:
+            return
+        self.static_signature = signature
+        self.canvas.delete('static')
+
+        if Image is None:
+            for kind, coords, options in self.static_items:
+                self.draw_static_item(kind, coords, options)
+            self.canvas.tag_lower('static')
+            return
+
+        image = Image.new('RGB', (self.canvas_width, self.canvas_height), 'white')
+        draw = ImageDraw.Draw(image)
+        try:
+            font = ImageFont.load_default(size=10)
+        except (TypeError, OSError):  # Pillow < 10.1 или без FreeType
+            font = ImageFont.load_default()
+        for kind, coords, options in self.static_items:
+            if kind == 'line':
+                if options.get('dash'):
+                    self.draw_dashed_line(draw, coords, options['fill'], options['dash'])
+                else:
+                    draw.line(coords, fill=options.get('fill', 'black'), width=options.get('width', 1))
+            elif kind == 'rectangle':
+                draw.rectangle(coords, fill=options.get('fill'), outline=options.get('outline', 'black'))
+            elif kind == 'polygon':
+                draw.polygon(coords, fill=options.get('fill'), outline=options.get('outline'))
+            elif kind == 'text':
+                draw.text(coords, options['text'], fill=options.get('fill', 'black'), font=font)
+
+        self.static_image = ImageTk.PhotoImage(image, master=self.root)
+        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.static_image, tags='static')
+        self.canvas.tag_lower('static')
+
+    def draw_static_item(self, kind, coords, options):
+        if kind == 'line':
+            self.canvas.create_line(*coords, tags='static', **options)
+        elif kind == 'rectangle':
+            self.canvas.create_rectangle(*coords, tags='static', **options)
+        elif kind == 'polygon':
+            self.canvas.create_polygon(coords, tags='static', **options)
+        elif kind == 'text':
+            self.canvas.create_text(*coords, anchor=tk.NW, tags='static', **options)
+
+    def draw_dashed_line(self, draw, coords, fill, dash):
+        x1, y1, x2, y2 = coords
+        length = math.hypot(x2 - x1, y2 - y1)
+        if not length:
+            return
+        dash_length, gap_length = dash
+        position = 0
+        while position < length:
+            end = min(position + dash_length, length)
+            draw.line((x1 + (x2 - x1) * position / length, y1 + (y2 - y1) * position / length,
+                       x1 + (x2 - x1) * end / length, y1 + (y2 - y1) * end / length), fill=fill)
+            position += dash_length + gap_length
 
     def run(self):
         self.root.mainloop()
 
     def draw_grid(self, width, height, step=50):
         for x in range(0, width, step):
-            self.canvas.create_line(x, 0, x, height, fill='lightgray', dash=(2, 2))
-            self.canvas.create_text(x, 5, text=str(x), anchor=tk.NW)
+            self.add_static('line', (x, 0, x, height), fill='lightgray', dash=(2, 2))
+            self.add_static('text', (x, 5), text=str(x))
         for y in range(0, height, step):
-            self.canvas.create_line(0, y, width, y, fill='lightgray', dash=(2, 2))
-            self.canvas.create_text(5, y, text=str(y), anchor=tk.NW)
+            self.add_static('line', (0, y, width, y), fill='lightgray', dash=(2, 2))
+            self.add_static('text', (5, y), text=str(y))
 
     def initialize_sensors(self, sensors):
         self.sensors = sensors
@@ -91,9 +181,9 @@ class TkinterDrawing(DrawingStrategy):
 
     def initialize_lines(self, lines):
         for line in lines:
-            self.canvas.create_line(line['start_x'], line['start_y'], 
-                                    line['end_x'], line['end_y'], 
-                                    width=line['width'])
+            self.add_static('line', (line['start_x'], line['start_y'],
+                                     line['end_x'], line['end_y']),
+                            width=line['width'])
 
     def draw_tanks(self):
         self.draw_tank(50, 500, 50, 100, 0.2)
@@ -151,7 +241,7 @@ class TkinterDrawing(DrawingStrategy):
         y1 = center_y - height / 2
         x2 = center_x + thickness / 2
         y2 = center_y + height / 2
-        return self.canvas.create_rectangle(x1, y1, x2, y2, fill=fill, outline='black')
+        self.add_static('rectangle', (x1, y1, x2, y2), fill=fill, outline='black')
 
     def draw_combustion_chamber_shape(self, center_x, center_y, width, height,
                                       nozzle_start_radius, nozzle_end_radius,
@@ -160,7 +250,7 @@ class TkinterDrawing(DrawingStrategy):
         chamber_right = center_x + width / 2
         chamber_top = center_y - height / 2
         chamber_bottom = center_y + height / 2
-        self.canvas.create_rectangle(chamber_left, chamber_top, chamber_right, chamber_bottom, fill="gray")
+        self.add_static('rectangle', (chamber_left, chamber_top, chamber_right, chamber_bottom), fill="gray")
 
         nozzle_start_x = chamber_right if nozzle_orientation == "right" else chamber_left - nozzle_length
         nozzle_start_y = center_y
@@ -185,7 +275,7 @@ class TkinterDrawing(DrawingStrategy):
             y_bottom = nozzle_start_y + radius
             bell_curve_points.append((x, y_bottom))
 
-        self.canvas.create_polygon(bell_curve_points, fill="gray")
+        self.add_static('polygon', [coord for point in bell_curve_points for coord in point], fill="gray")
 
     def update_sensor(self, sensor):
         # Update sensor display
@@ -197,8 +287,17 @@ class TkinterDrawing(DrawingStrategy):
         self.canvas.itemconfig(valve.shape, fill=new_color)
         self.canvas.itemconfig(valve.label, text=new_text, fill=new_color)
 
+    def update_connection_state(self, device, state):
+        color = CONNECTION_COLORS.get(state, 'red')
+        if getattr(device, 'rectangle', None) is not None:
+            self.canvas.itemconfig(device.rectangle, outline=color)
+        if getattr(device, 'button', None) is not None:
+            device.button.config(state=tk.NORMAL if state == 'connected' else tk.DISABLED)
+            self.canvas.itemconfig(device.shape, outline='black' if state == 'connected' else color)
+
     def show_graph_window(self, sensor):
         print(f"Opening graph window for sensor {sensor.name}...")
+        load_matplotlib()
         
         # Проверяем существование окна и его валидность
         if sensor.id in self.graph_windows:
@@ -284,7 +383,7 @@ class TkinterDrawing(DrawingStrategy):
             return
         
         graph_data = self.graph_windows[sensor_id]
-        current_time = time.time() - self.start_time
+        current_time = self.clock() - self.start_time
 
         # Получаем актуальные данные
         if graph_data['data_filled']:
@@ -323,7 +422,7 @@ class TkinterDrawing(DrawingStrategy):
         if not self.graph_shown or not self.graph_windows:
             return
 
-        current_time = time.time()
+        current_time = self.clock()
         if current_time - self.last_update_time < GRAPH_UPDATE_INTERVAL/1000.0:
             return
         
@@ -5,33 +5,69 @@ import json
 import os
 import csv
 from datetime import datetime
-from communication import connect_to_serial_port, send_message, receive_message, parse_message
+from communication import (connect_to_serial_port, send_message, receive_message, parse_message,
+                           describe_serial_port, find_serial_port)
 from devices import Sensor, Valve
+import profiling
+
+PORT_CONNECT_TIMEOUT = 2.0  # с, после этого порт считается недоступным
+PORT_POLL_INTERVAL = 20  # ms, проверка таймаутов подключения при запуске
+RECONNECT_MIN_DELAY = 0.5  # с, первая пауза перед повторным подключением
+RECONNECT_MAX_DELAY = 30.0  # с, предел экспоненциального роста паузы
+STABLE_CONNECTION_TIME = 10.0  # с, после такой работы без ошибок пауза сбрасывается
 
 class LabPneumoLogic:
-    def __init__(self, drawing):
+    def __init__(self, drawing, config_path=None, connect=connect_to_serial_port, clock=time.time,
+                 startup_time=None, start=True):
+        self.startup_time = startup_time or time.perf_counter()
+        self.startup_phases = []
+        self.mark_startup('imports and window')
         self.drawing = drawing
+        self.config_path = config_path or os.path.dirname(os.path.abspath(__file__)) + '/config.json'
+        self.connect = connect  # serial.Serial или ReplaySession.connect
+        self.clock = clock
         self.sensors = {}
         self.valves = {}
         self.lines = []
         self.sensor_data_queue = queue.Queue()
         self.serial_connections = {}
+        self.port_states = {}  # порт -> 'connecting' / 'connected' / 'offline'
+        self.port_stats = {}
+        self.connect_deadline = None
+        self.startup_complete = False
+        self.first_value_received = False
         self.serial_queue = queue.Queue()
         self.stop_event = threading.Event()
         self.csv_file = None
         self.csv_writer = None
-        self.start_time = time.time()
+        self.raw_file = None
+        self.raw_writer = None
+        self.start_time = self.clock()
+        self.drawing.clock = self.clock
+        self.drawing.start_time = self.start_time
+
+        if start:
+            self.start()
 
-        self.load_config_and_connect()
+    def start(self):
+        self.load_config_and_devices()
+        self.mark_startup('config')
         self.initialize_ui()
-        self.start_serial_threads()
+        self.mark_startup('ui')
         self.initialize_csv_logging()
+        self.mark_startup('logging')
 
+        # Порты открываются параллельно, интерфейс уже показан в состоянии «connecting»
+        self.start_port_connections()
+        self.drawing.root.after(0, lambda: self.mark_startup('event loop'))
+        self.drawing.root.after(PORT_POLL_INTERVAL, self.check_port_timeouts)
         self.drawing.root.after(100, self.process_serial_data)
         self.drawing.root.after(100, self.update_sensor_values_from_queue)
 
-    def load_config_and_connect(self):
-        config = self.load_config(os.path.dirname(os.path.abspath(__file__)) + '/config.json')
+    def load_config_and_devices(self):
+        self.load_devices(self.load_config(self.config_path))
+
+    def load_devices(self, config):
         self.load_sensors(config['sensors'])
         self.load_valves(config['valves'])
         self.lines = config['lines']
@@ -44,72 +80,247 @@ class LabPneumoLogic:
         for sensor_data in sensors_data:
             sensor = Sensor.from_json(sensor_data)
             self.sensors[sensor.id] = sensor
-            self.connect_to_port(sensor.port)
+            self.add_port(sensor.port)
 
     def load_valves(self, valves_data):
         for valve_data in valves_data:
             valve = Valve.from_json(valve_data)
             self.valves[valve.id] = valve
-            self.connect_to_port(valve.port)
+            self.add_port(valve.port)
+
+    def add_port(self, port):
+        if port not in self.port_states:
+            self.port_states[port] = 'connecting'
+            self.serial_connections[port] = None
+            self.port_stats[port] = {
+                'path': port,
+                'connected_since': None,
+                'uptime': 0.0,
+                'reconnects': 0,
+                'disconnects': 0,
+                'last_error': None
+            }
+
+    def start_port_connections(self):
+        self.connect_deadline = time.perf_counter() + PORT_CONNECT_TIMEOUT
+        for port in self.port_states:
+            thread = threading.Thread(target=self.port_thread, args=(port,), name=f"serial-{port}")
+            thread.daemon = True
+            thread.start()
 
-    def connect_to_port(self, port):
-        if port not in self.serial_connections:
-            connection = connect_to_serial_port(port, 115200)
+    def port_thread(self, port):
+        """Подключение, чтение и переподключение одного порта с экспоненциальной паузой.
+
+        После обрыва устройство ищется заново по серийному номеру / VID:PID,
+        так как после переподключения USB оно может получить другое имя порта.
+        Пока запомненного устройства нет, порт остаётся отключённым: под прежним
+        именем может оказаться другой адаптер.
+        """
+        delay = RECONNECT_MIN_DELAY
+        device = None
+        offline_reported = False
+        while not self.stop_event.is_set():
+            path = find_serial_port(device, port, self.ports_in_use(port)) if device else port
+            connection = self.connect(path, 115200) if path else None
             if connection is None:
-                print(f"Warning: Could not connect to port {port}")
-            self.serial_connections[port] = connection
+                if not offline_reported:
+                    error = "could not open port" if path else "device not found"
+                    self.put_port_event(port, 'offline', error=error)
+                    offline_reported = True
+                self.stop_event.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
 
-    def initialize_ui(self):
-        self.drawing.initialize_ui(self.sensors, self.valves, self.lines, self.toggle_valve)
+            if device is None:
+                device = describe_serial_port(path)
+            self.put_port_event(port, 'connected', connection=connection, path=path)
+            offline_reported = False
+            connected_at = time.monotonic()
 
-    def start_serial_threads(self):
-        for port, connection in self.serial_connections.items():
-            if connection is not None:  # Only start thread if connection exists
-                thread = threading.Thread(target=self.serial_read_thread, args=(port,))
-                thread.daemon = True
-                thread.start()
-
-    def serial_read_thread(self, port):
-        connection = self.serial_connections[port]
-        if connection is None:  # Skip if connection is not available
-            print(f"Warning: No connection available for port {port}")
-            return
-        
+            error = self.read_port(port, connection)
+            try:
+                connection.close()
+            except Exception:
+                pass
+            if error is None:  # остановка программы
+                break
+            print(f"Error reading from {port}: {error}")
+            self.put_port_event(port, 'offline', error=error)
+            offline_reported = True
+
+            # Адаптер, который открывается и сразу падает, не должен переподключаться без паузы
+            if time.monotonic() - connected_at >= STABLE_CONNECTION_TIME:
+                delay = RECONNECT_MIN_DELAY
+            self.stop_event.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def ports_in_use(self, port):
+        """Имена портов, которые нельзя занимать при поиске устройства порта port"""
+        excluded = set()
+        for other_port, stats in list(self.port_stats.items()):
+            if other_port == port:
+                continue
+            excluded.add(other_port)
+            if self.port_states.get(other_port) == 'connected':
+                excluded.add(stats['path'])
+        return excluded
+
+    def read_port(self, port, connection):
+        """Читает порт до ошибки (возвращает её текст) или до остановки (None)"""
         while not self.stop_event.is_set():
+            read_start = profiling.start_time()
             try:
                 received_message = receive_message(connection, timeout=1)
-                if received_message:
-                    self.serial_queue.put((port, received_message))
             except Exception as e:
-                print(f"Error reading from {port}: {str(e)}")
-                time.sleep(1)  # Add delay to avoid rapid error messages
+                return str(e)
+            if received_message:
+                # Пустые чтения (ожидание до таймаута) в трассу не пишутся
+                profiling.span_since('serial.read', 'reader', read_start, {'port': port})
+                self.serial_queue.put((port, received_message, self.clock()))
+        return None
+
+    def put_port_event(self, port, state, connection=None, path=None, error=None):
+        # События идут через ту же очередь, что и сообщения, чтобы отметки разрывов
+        # в записи стояли на своём месте относительно данных
+        event = {'state': state, 'connection': connection, 'path': path, 'error': error}
+        self.serial_queue.put((port, event, self.clock()))
+
+    def handle_port_event(self, port, event, timestamp):
+        state = event['state']
+        stats = self.port_stats[port]
+        previous_state = self.port_states.get(port)
+        now = time.monotonic()
+        self.serial_connections[port] = event['connection']
+
+        if state == 'connected':
+            stats['path'] = event['path']
+            stats['connected_since'] = now
+            if stats['disconnects']:
+                stats['reconnects'] += 1
+                text = f"{port} reconnected"
+                print(f"Reconnected to {port} via {event['path']} (reconnect #{stats['reconnects']})")
+            else:
+                text = f"{port} connected"
+        else:
+            stats['last_error'] = event['error']
+            if previous_state == 'connected':
+                stats['disconnects'] += 1
+                stats['uptime'] += now - stats['connected_since']
+                stats['connected_since'] = None
+                text = f"{port} disconnected: {event['error']}"
+            else:
+                print(f"Warning: Could not connect to port {port}")
+                text = f"{port} offline: {event['error']}"
+
+        self.raw_writer.writerow([f"{timestamp:.6f}", port, '', text])
+        if previous_state != state:
+            self.set_port_state(port, state)
+        if stats['disconnects']:
+            # Разрыв отмечается и в файле значений, после уже полученных данных
+            self.sensor_data_queue.put((timestamp, {}, {'port': port, 'state': state, 'text': text}))
+
+    def check_port_timeouts(self):
+        pending = [port for port, state in self.port_states.items() if state == 'connecting']
+        if pending and time.perf_counter() > self.connect_deadline:
+            for port in pending:
+                # Поток порта продолжает попытки и сообщит о подключении сам
+                print(f"Warning: Timed out connecting to port {port}")
+                self.set_port_state(port, 'offline')
+            pending = []
+
+        if pending:
+            self.drawing.root.after(PORT_POLL_INTERVAL, self.check_port_timeouts)
+        else:
+            self.mark_startup('ports')
+            self.print_startup_report()
+            self.startup_complete = True
+
+    def port_statistics(self):
+        """Состояние, время работы и число переподключений каждого порта"""
+        now = time.monotonic()
+        result = {}
+        for port, stats in self.port_stats.items():
+            uptime = stats['uptime']
+            if stats['connected_since'] is not None:
+                uptime += now - stats['connected_since']
+            result[port] = {
+                'state': self.port_states[port],
+                'path': stats['path'],
+                'uptime': uptime,
+                'reconnects': stats['reconnects'],
+                'disconnects': stats['disconnects'],
+                'last_error': stats['last_error']
+            }
+        return result
+
+    def print_port_statistics(self):
+        for port, stats in self.port_statistics().items():
+            print(f"{port}: {stats['state']}, uptime {stats['uptime']:.1f} s, "
+                  f"reconnects {stats['reconnects']}, last error: {stats['last_error']}")
+
+    def set_port_state(self, port, state):
+        self.port_states[port] = state
+        if not self.startup_complete:
+            self.mark_startup(f"port {port} {state}")
+        for device in list(self.sensors.values()) + list(self.valves.values()):
+            if device.port == port:
+                self.drawing.update_connection_state(device, state)
+
+    def mark_startup(self, phase):
+        self.startup_phases.append((phase, time.perf_counter() - self.startup_time))
+
+    def print_startup_report(self):
+        previous = 0.0
+        print("Startup time breakdown:")
+        for phase, elapsed in self.startup_phases:
+            print(f"  {phase:<30} {elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:.1f} ms)")
+            previous = elapsed
+
+    def initialize_ui(self):
+        self.drawing.initialize_ui(self.sensors, self.valves, self.lines, self.toggle_valve)
+        self.drawing.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        for device in list(self.sensors.values()) + list(self.valves.values()):
+            self.drawing.update_connection_state(device, self.port_states.get(device.port, 'offline'))
 
     def process_serial_data(self):
+        profiling.counter('serial_queue', self.serial_queue.qsize())
         try:
             while not self.serial_queue.empty():
-                port, message = self.serial_queue.get_nowait()
+                port, message, timestamp = self.serial_queue.get_nowait()
+                if isinstance(message, dict):
+                    self.handle_port_event(port, message, timestamp)
+                    continue
+                self.raw_writer.writerow([f"{timestamp:.6f}", port, message, ''])
                 parsed_message = parse_message(message)
                 if parsed_message and parsed_message.get('sensor_id'):
                     sensor_id = parsed_message['sensor_id']
                     value = parsed_message['value']
-                    self.sensor_data_queue.put({sensor_id: value})
+                    self.sensor_data_queue.put((timestamp, {sensor_id: value}, None))
                 else:
                     print(f"Received command from {port}: {message}")
         except queue.Empty:
             pass
         finally:
+            with profiling.span('raw.flush', 'writer'):
+                self.raw_file.flush()
             self.drawing.root.after(100, self.process_serial_data)
 
     def update_sensor_values_from_queue(self):
         try:
             while not self.sensor_data_queue.empty():
-                data = self.sensor_data_queue.get_nowait()
+                timestamp, data, event = self.sensor_data_queue.get_nowait()
+                if event:
+                    self.record_port_gap(timestamp, event)
                 for sensor_id, raw_value in data.items():
                     sensor = self.sensors.get(sensor_id)
                     if sensor:
                         sensor.process_signal(raw_value)
                         self.drawing.update_sensor(sensor)
-                        self.write_sensor_data_to_csv()
+                        if not self.first_value_received:
+                            self.first_value_received = True
+                            elapsed = time.perf_counter() - self.startup_time
+                            print(f"First live value after {elapsed * 1000:.1f} ms")
+                        self.write_sensor_data_to_csv(timestamp)
         finally:
             self.drawing.update_graph(self.sensors)
             self.drawing.root.after(100, self.update_sensor_values_from_queue)
@@ -123,12 +334,28 @@ class LabPneumoLogic:
         headers = ['Timestamp', 'Relative_Time']
         for sensor in self.sensors.values():
             headers.append(f"{sensor.name} ({sensor.units})")
+        headers.append('Event')
         
         self.csv_writer = csv.writer(self.csv_file)
         self.csv_writer.writerow(headers)
 
-    def write_sensor_data_to_csv(self):
-        current_time = time.time()
+        # Сырые сообщения для последующего воспроизведения (replay.py)
+        self.raw_file = open(f"raw_data_{timestamp}.csv", 'w', newline='')
+        self.raw_writer = csv.writer(self.raw_file)
+        self.raw_writer.writerow(['Timestamp', 'Port', 'Message', 'Event'])
+
+    def record_port_gap(self, timestamp, event):
+        if event['state'] != 'connected':
+            # Пустые значения в CSV отмечают отсутствие данных на время разрыва
+            for sensor in self.sensors.values():
+                if sensor.port == event['port']:
+                    sensor.value = None
+                    self.drawing.update_sensor(sensor)
+        self.write_sensor_data_to_csv(timestamp, event['text'])
+
+    def write_sensor_data_to_csv(self, current_time=None, event=''):
+        if current_time is None:
+            current_time = self.clock()
         relative_time = current_time - self.start_time
         timestamp = datetime.fromtimestamp(current_time).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
         
@@ -136,22 +363,31 @@ class LabPneumoLogic:
         row = [timestamp, f"{relative_time:.3f}"]
         for sensor in self.sensors.values():
             row.append(str(sensor.value) if sensor.value is not None else '')
+        row.append(event)
         
-        self.csv_writer.writerow(row)
-        self.csv_file.flush()  # Сразу записываем в файл
+        with profiling.span('csv.write', 'writer'):
+            self.csv_writer.writerow(row)
+            self.csv_file.flush()  # Сразу записываем в файл
 
     def toggle_valve(self, valve):
         connection = self.serial_connections.get(valve.port)
         if connection is None:
             print(f"Warning: No connection available for valve {valve.id} on port {valve.port}")
             return
-        send_message(connection, json.dumps({"type": 1, "command": 17, "valve_pin": valve.pin, "result": 0}))
+        try:
+            send_message(connection, json.dumps({"type": 1, "command": 17, "valve_pin": valve.pin, "result": 0}))
+        except Exception as e:
+            print(f"Error sending command to valve {valve.id} on port {valve.port}: {e}")
+            return
         valve.toggle()
         self.drawing.toggle_valve(valve)
 
     def on_closing(self):
+        self.print_port_statistics()
         if self.csv_file:
             self.csv_file.close()
+        if self.raw_file:
+            self.raw_file.close()
         self.stop_event.set()
         time.sleep(1)
         self.drawing.root.destroy()
\ No newline at end of file
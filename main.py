@@ -1,15 +1,42 @@
+import time
+STARTUP_TIME = time.perf_counter()  # до тяжёлых импортов, для отчёта о времени запуска
+
+import argparse
 from lab_pneumo_logic import LabPneumoLogic
 from gui_factory import create_gui
+from replay import ReplaySession
+import profiling
 
 class LabPneumoStand(LabPneumoLogic):
-    def __init__(self, gui_strategy):
+    def __init__(self, gui_strategy, **kwargs):
         self.gui = gui_strategy
-        LabPneumoLogic.__init__(self, self.gui)
+        LabPneumoLogic.__init__(self, self.gui, **kwargs)
 
     def run(self):
         self.gui.run()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Laboratory Pneumo Stand Control")
+    parser.add_argument('--config', help="path to config.json")
+    parser.add_argument('--replay', help="raw_data_*.csv recording to replay instead of serial ports")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay speed multiplier, 0 = as fast as possible")
+    parser.add_argument('--profile', metavar='TRACE_JSON',
+                        help="profile Tk callbacks and save a Chrome/Perfetto trace on exit")
+    parser.add_argument('--stall-ms', type=float, default=100,
+                        help="callbacks blocking the event loop longer than this are reported as stalls")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable(args.stall_ms, args.profile)
+
+    options = {'config_path': args.config, 'startup_time': STARTUP_TIME}
+    if args.replay:
+        session = ReplaySession(args.replay, args.speed)
+        options.update(connect=session.connect, clock=session.now)
+
     gui_strategy = create_gui("tkinter", "1280x768", "Laboratory Pneumo Stand Control")
-    app = LabPneumoStand(gui_strategy)
+    app = LabPneumoStand(gui_strategy, **options)
+    if args.replay:
+        session.start(app.port_states, app.serial_queue, app.stop_event)
     app.run()
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""Профилирование цикла событий Tk (включается явно через enable()).
+
+Оборачивает все колбэки after/after_idle и обработчики событий bind/tag_bind,
+замеряет их длительность, отмечает колбэки, блокирующие цикл дольше порога
+(со стеком, снятым сторожевым потоком), и сохраняет трассу в формате
+Chrome/Perfetto (chrome://tracing, ui.perfetto.dev).
+"""
+import atexit
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+import traceback
+
+MAX_EVENTS = 200000  # ограничение каждого буфера событий трассы
+
+_profiler = None
+_null_span = contextlib.nullcontext()
+
+
+def _now_us():
+    return time.perf_counter_ns() / 1000.0
+
+
+def _callback_name(func):
+    return getattr(func, '__qualname__', None) or getattr(func, '__name__', None) or repr(func)
+
+
+class LoopProfiler:
+    def __init__(self, stall_threshold_ms=100, trace_path=None):
+        self.stall_threshold = stall_threshold_ms / 1000.0
+        self.trace_path = trace_path
+        self.events = collections.deque(maxlen=MAX_EVENTS)  # колбэки Tk и зависания
+        # Интервалы и счётчики потоков чтения/записи идут отдельно, чтобы не вытеснять колбэки
+        self.span_events = collections.deque(maxlen=MAX_EVENTS)
+        self.thread_names = {}
+        self.stats = {}  # имя колбэка -> [вызовы, суммарное время, максимум, зависания]
+        self.lock = threading.Lock()
+        self.main_thread_id = threading.main_thread().ident
+        self.current = None  # (имя, время начала, номер) колбэка, выполняемого сейчас
+        self.call_counter = 0
+        self.stall_stacks = {}
+        self.originals = {}
+        self.stop_event = threading.Event()
+        self.watchdog = None
+
+    # --- Установка обёрток ---
+
+    def install(self):
+        profiler = self
+        original_after = tk.Misc.after
+        original_bind = tk.Misc._bind
+        # after_idle не подменяется: он вызывает self.after('idle', ...) и уже попадает сюда
+        self.originals = {'after': original_after, '_bind': original_bind}
+
+        def after(widget, ms, func=None, *args):
+            if func is None:
+                return original_after(widget, ms)
+            return original_after(widget, ms, profiler.wrap(func, 'after'), *args)
+
+        def _bind(widget, what, sequence, func, add, needcleanup=1):
+            if callable(func):
+                func = profiler.wrap(func, 'event', sequence)
+            return original_bind(widget, what, sequence, func, add, needcleanup)
+
+        tk.Misc.after = after
+        tk.Misc._bind = _bind
+
+        self.watchdog = threading.Thread(target=self.watchdog_thread, name="profiler-watchdog", daemon=True)
+        self.watchdog.start()
+
+    def uninstall(self):
+        for name, original in self.originals.items():
+            setattr(tk.Misc, name, original)
+        self.originals = {}
+        self.stop_event.set()
+
+    def wrap(self, func, category, sequence=None):
+        name = _callback_name(func)
+        if sequence:
+            name = f"{name} {sequence}"
+
+        def timed(*args):
+            self.call_counter += 1
+            previous = self.current
+            token = self.call_counter
+            start = time.perf_counter()
+            self.current = (name, start, token)
+            try:
+                return func(*args)
+            finally:
+                duration = time.perf_counter() - start
+                self.current = previous
+                self.record_callback(name, category, start, duration, token)
+
+        timed.__qualname__ = name
+        return timed
+
+    # --- Сбор событий ---
+
+    def add_event(self, event, buffer):
+        tid = threading.get_ident()
+        event['pid'] = os.getpid()
+        event['tid'] = tid
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        with self.lock:
+            buffer.append(event)
+
+    def record_callback(self, name, category, start, duration, token):
+        stats = self.stats.setdefault(name, [0, 0.0, 0.0, 0])
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] = max(stats[2], duration)
+
+        event = {'name': name, 'cat': f"tk.{category}", 'ph': 'X',
+                 'ts': start * 1e6, 'dur': duration * 1e6}
+        if duration > self.stall_threshold:
+            stats[3] += 1
+            stack = self.stall_stacks.pop(token, None)
+            event['args'] = {'stall': True, 'stack': ''.join(stack) if stack else None}
+            print(f"Event loop stall: {name} blocked for {duration * 1000:.0f} ms")
+        self.add_event(event, self.events)
+
+    @contextlib.contextmanager
+    def span(self, name, category, args=None):
+        start = _now_us()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, args)
+
+    def add_span(self, name, category, start, args=None):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': _now_us() - start}
+        if args:
+            event['args'] = args
+        self.add_event(event, self.span_events)
+
+    def counter(self, name, value):
+        self.add_event({'name': name, 'ph': 'C', 'ts': _now_us(), 'args': {name: value}}, self.span_events)
+
+    def watchdog_thread(self):
+        """Снимает стек главного потока, если колбэк выполняется дольше порога"""
+        interval = max(self.stall_threshold / 4, 0.005)
+        while not self.stop_event.wait(interval):
+            current = self.current
+            if current is None:
+                continue
+            name, start, token = current
+            if token in self.stall_stacks or time.perf_counter() - start < self.stall_threshold:
+                continue
+            frame = sys._current_frames().get(self.main_thread_id)
+            if frame is not None:
+                self.stall_stacks[token] = traceback.format_stack(frame)
+
+    # --- Результаты ---
+
+    def export_trace(self, file_path):
+        with self.lock:
+            events = list(self.events) + list(self.span_events)
+        pid = os.getpid()
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                    for tid, name in self.thread_names.items()]
+        with open(file_path, 'w') as file:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, file)
+        print(f"Trace saved to {file_path} ({len(events)} events)")
+
+    def print_summary(self, limit=15):
+        print(f"{'callback':<60} {'calls':>8} {'total ms':>10} {'max ms':>8} {'stalls':>7}")
+        rows = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (calls, total, longest, stalls) in rows[:limit]:
+            print(f"{name[:60]:<60} {calls:>8} {total * 1000:>10.1f} {longest * 1000:>8.1f} {stalls:>7}")
+
+    def finish(self):
+        self.uninstall()
+        self.print_summary()
+        if self.trace_path:
+            self.export_trace(self.trace_path)
+
+
+def enable(stall_threshold_ms=100, trace_path=None):
+    """Включает профилирование; трасса сохраняется при выходе из программы"""
+    global _profiler
+    if _profiler is None:
+        _profiler = LoopProfiler(stall_threshold_ms, trace_path)
+        _profiler.install()
+        atexit.register(_profiler.finish)
+    return _profiler
+
+
+def span(name, category, args=None):
+    """Интервал для трассы, например запись CSV или чтение порта; без профилирования ничего не делает"""
+    if _profiler is None:
+        return _null_span
+    return _profiler.span(name, category, args)
+
+
+def start_time():
+    """Начало интервала для span_since; без профилирования None"""
+    if _profiler is None:
+        return None
+    return _now_us()
+
+
+def span_since(name, category, start, args=None):
+    """Интервал от start_time() до текущего момента, когда записывать его решают по результату"""
+    if _profiler is not None and start is not None:
+        _profiler.add_span(name, category, start, args)
+
+
+def counter(name, value):
+    if _profiler is not None:
+        _profiler.counter(name, value)
@@ -0,0 +1,123 @@
+import csv
+import threading
+import time
+
+REPLAY_QUEUE_LIMIT = 5000  # сообщений в очереди, при которых подача без задержек приостанавливается
+
+
+def load_recording(file_path):
+    """Читает файл raw_data_*.csv: список (timestamp, port, message)"""
+    messages = []
+    with open(file_path, 'r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # заголовок
+        for row in reader:
+            if len(row) < 3 or (len(row) > 3 and row[3]):
+                continue  # отметки подключения/разрыва портов не воспроизводятся
+            messages.append((float(row[0]), row[1], row[2]))
+    messages.sort(key=lambda item: item[0])
+    return messages
+
+
+class ReplayConnection:
+    """Заменяет serial.Serial: readline() отдаёт записанные сообщения своего порта"""
+    def __init__(self, session, port):
+        self.session = session
+        self.port = port
+        self.timeout = None
+
+    def readline(self):
+        return self.session.read(self.port, self.timeout)
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class ReplaySession:
+    """Воспроизведение записанной сессии с исходными интервалами, в speed раз быстрее
+    или, при speed=None, так быстро, как успевает конвейер.
+
+    Сообщения всех портов выдаются строго в записанном порядке, а now() в потоке
+    чтения возвращает записанное время последнего выданного этому потоку сообщения.
+    Без задержек (speed=None) сообщения не раздаются потокам портов по одному,
+    а подаются одним потоком прямо в очередь serial_queue.
+    """
+    def __init__(self, file_path, speed=None):
+        self.messages = load_recording(file_path)
+        self.speed = speed or None
+        self.start_time = self.messages[0][0] if self.messages else time.time()
+        self.ports = set()
+        self.index = 0
+        self.wall_start = None
+        self.last_timestamp = self.start_time
+        self.condition = threading.Condition()
+        self.local = threading.local()
+        self.feeding = False
+
+    def connect(self, port, baudrate=115200):
+        self.ports.add(port)
+        return ReplayConnection(self, port)
+
+    def now(self):
+        return getattr(self.local, 'timestamp', self.last_timestamp)
+
+    @property
+    def finished(self):
+        return self.index >= len(self.messages)
+
+    def start(self, ports, serial_queue=None, stop_event=None):
+        """Запускает воспроизведение для портов конфигурации; до этого read() ждёт.
+
+        Набор портов фиксируется заранее: сообщения порта без читающего потока
+        заблокировали бы очередь, а порты, подключившиеся позже, потеряли бы данные.
+        """
+        with self.condition:
+            self.messages = [item for item in self.messages if item[1] in ports]
+            self.wall_start = time.monotonic()
+            self.feeding = self.speed is None and serial_queue is not None
+            self.condition.notify_all()
+        if self.feeding:
+            thread = threading.Thread(target=self.feed_thread, args=(serial_queue, stop_event or threading.Event()),
+                                      name="replay-feeder")
+            thread.daemon = True
+            thread.start()
+
+    def feed_thread(self, serial_queue, stop_event):
+        # Тот же формат, что у LabPneumoLogic.read_port: (порт, сообщение, время)
+        for timestamp, port, message in self.messages:
+            while serial_queue.qsize() > REPLAY_QUEUE_LIMIT:
+                if stop_event.wait(0.001):
+                    return
+            self.last_timestamp = timestamp
+            serial_queue.put((port, message, timestamp))
+            self.index += 1
+
+    def read(self, port, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                if self.feeding:  # сообщения подаёт feed_thread, соединения простаивают
+                    self.condition.wait(timeout)
+                    return b''
+                wait = None
+                if (self.wall_start is not None and not self.finished
+                        and self.messages[self.index][1] == port):
+                    timestamp, _, message = self.messages[self.index]
+                    if self.speed:
+                        wait = self.wall_start + (timestamp - self.start_time) / self.speed - time.monotonic()
+                    if not self.speed or wait <= 0:
+                        self.index += 1
+                        self.last_timestamp = timestamp
+                        self.local.timestamp = timestamp
+                        self.condition.notify_all()
+                        return (message + '\n').encode('utf-8')
+
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return b''
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.condition.wait(wait)